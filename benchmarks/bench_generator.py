@@ -0,0 +1,198 @@
+"""
+Benchmark code generation against synthetic specs.
+
+Every case runs in a fresh process, so peak RSS and template compilation
+are measured per case. Results are written as JSON; pass --baseline with
+an earlier results file to flag regressions.
+
+    python benchmarks/bench_generator.py --sizes 10 100 1000 --out results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_code_generator.codegen import Generator, SpecLoader, plan_outputs  # noqa: E402
+from synthetic import PROFILES, synthesize_spec  # noqa: E402
+
+# Metrics compared against a baseline; larger values are worse
+COMPARED_METRICS = ["parse_seconds", "render_seconds", "generate_seconds", "peak_rss_kb"]
+
+
+def peak_rss_kb() -> int:
+    """
+    Peak resident set size of this process in KiB
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def run_case(profile: str, n_models: int, shard: bool, jobs: int) -> dict:
+    """
+    Measure one spec size/profile; meant to run in a fresh process
+    """
+    spec = synthesize_spec(n_models, **PROFILES[profile])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spec_path = os.path.join(tmp_dir, "spec.yaml")
+        with open(spec_path, "w") as f:
+            yaml.safe_dump(spec, f, sort_keys=False)
+
+        start = time.perf_counter()
+        with open(spec_path) as f:
+            loaded = yaml.load(f, Loader=SpecLoader)
+        parse_seconds = time.perf_counter() - start
+        context = {"models": loaded.get("models", {}), "options": loaded.get("options", {})}
+
+        # Render each planned output without the bytecode cache, timing per template
+        generator = Generator(bytecode_cache=False)
+        compile_seconds = 0.0
+        render_seconds = defaultdict(float)
+        bytes_written = defaultdict(int)
+        out_dir = os.path.join(tmp_dir, "render")
+        for template_name, output_name, template_context in plan_outputs(context, shard):
+            start = time.perf_counter()
+            template = generator.env.get_template(template_name)
+            compile_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            content = template.render(template_context)
+            render_seconds[template_name] += time.perf_counter() - start
+
+            out_path = os.path.join(out_dir, *output_name.split("/"))
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, "w") as out:
+                bytes_written[template_name] += out.write(content)
+
+        # End-to-end run through the public API
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Generator(bytecode_cache=False).generate(
+                spec_path, os.path.join(tmp_dir, "app"), shard=shard, jobs=jobs
+            )
+        generate_seconds = time.perf_counter() - start
+
+        spec_bytes = os.path.getsize(spec_path)
+
+    return {
+        "profile": profile,
+        "models": n_models,
+        "fields": sum(len(m["fields"]) for m in spec["models"].values()),
+        "relationships": sum(len(m["relationships"]) for m in spec["models"].values()),
+        "shard": shard,
+        "jobs": jobs,
+        "spec_bytes": spec_bytes,
+        "parse_seconds": parse_seconds,
+        "compile_seconds": compile_seconds,
+        "render_seconds": sum(render_seconds.values()),
+        "render_seconds_per_template": dict(render_seconds),
+        "bytes_written": sum(bytes_written.values()),
+        "bytes_written_per_template": dict(bytes_written),
+        "generate_seconds": generate_seconds,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def environment_info() -> dict:
+    """
+    Describe the machine and revision the results were measured on
+    """
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "revision": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """
+    List metrics that grew by more than threshold relative to the baseline
+    """
+    key = lambda r: (r["profile"], r["models"], r["shard"], r["jobs"])  # noqa: E731
+    previous = {key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if before[metric] and result[metric] > before[metric] * (1 + threshold):
+                regressions.append({
+                    "case": dict(zip(("profile", "models", "shard", "jobs"), key(result))),
+                    "metric": metric,
+                    "baseline": before[metric],
+                    "current": result[metric],
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark code generation against synthetic specs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="Numbers of models to generate")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES),
+                        help="Spec shapes to benchmark")
+    parser.add_argument("--shard", action="store_true", help="Benchmark the sharded output layout")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes for the end-to-end run")
+    parser.add_argument("--out", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative growth reported as a regression (default: 0.2)")
+    args = parser.parse_args()
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for profile in args.profiles:
+        for n_models in args.sizes:
+            # One process per case, so peak RSS isn't inherited from earlier cases
+            with ctx.Pool(1) as pool:
+                result = pool.apply(run_case, (profile, n_models, args.shard, args.jobs))
+            print(
+                f"{profile:>8} {n_models:>6} models: render {result['render_seconds']:.3f}s, "
+                f"generate {result['generate_seconds']:.3f}s, "
+                f"{result['bytes_written'] / 1024:.0f} KiB, peak RSS {result['peak_rss_kb'] / 1024:.0f} MiB",
+                file=sys.stderr,
+            )
+            results.append(result)
+
+    report = {"environment": environment_info(), "results": results}
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.threshold)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if report.get("regressions"):
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Benchmark the generated /<model>/query endpoints against SQLite.
+
+Generates an app from a chain-shaped synthetic spec (Model0 -> Model1 ->
+... -> Model4, one_to_many at every hop), seeds a temporary aiosqlite
+database with --rows root rows and --fanout children per parent, and drives
+POST /model0/query in-process through an ASGI client for every include
+depth. Reports latency percentiles, SQL statements per request and rows
+(root plus nested objects in the response) per second as JSON.
+
+    python benchmarks/bench_queries.py --rows 100 --fanout 3 --requests 50
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_code_generator.codegen import Generator  # noqa: E402
+from synthetic import model_name, synthesize_spec  # noqa: E402
+
+# Models in the relationship chain; include depth 0..CHAIN_LENGTH - 1
+CHAIN_LENGTH = 5
+
+# Package name the app is generated as
+APP_PACKAGE = "bench_app"
+
+
+def generate_app(root_dir: str, width: int, fanout: int, limit: int):
+    """
+    Generate the benchmark app into root_dir/APP_PACKAGE, with a query
+    budget fitting the deepest include of a page of limit rows
+    """
+    spec = synthesize_spec(CHAIN_LENGTH, width=width, fanout=1)
+    rows = (limit + 1) * sum(fanout ** depth for depth in range(CHAIN_LENGTH))
+    spec["options"] = {
+        "max_include_depth": CHAIN_LENGTH,
+        "query_budget": {"default_fanout": fanout, "max_estimated_rows": rows, "max_loaded_rows": rows},
+    }
+    spec_path = os.path.join(root_dir, "spec.yaml")
+    with open(spec_path, "w") as f:
+        yaml.safe_dump(spec, f, sort_keys=False)
+
+    app_dir = os.path.join(root_dir, APP_PACKAGE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        Generator().generate(spec_path, app_dir)
+    open(os.path.join(app_dir, "__init__.py"), "w").close()
+
+
+def column_value(column, i: int):
+    """
+    Deterministic value for a seeded column
+    """
+    type_name = type(column.type).__name__
+    if type_name == "Integer":
+        return i
+    if type_name == "Float":
+        return i * 0.5
+    if type_name == "JSON":
+        return {"i": i}
+    return f"{column.name} {i}"
+
+
+async def seed(engine, models, rows: int, fanout: int):
+    """
+    Insert rows root objects and fanout children per parent at every level
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        parent_ids = []
+        for level in range(CHAIN_LENGTH):
+            table = getattr(models, model_name(level)).__table__
+            count = rows if level == 0 else len(parent_ids) * fanout
+            batch = []
+            for i in range(1, count + 1):
+                row = {
+                    column.name: column_value(column, i)
+                    for column in table.columns
+                    if column.name not in ("id", "parent_id")
+                }
+                row["id"] = i
+                if level:
+                    row["parent_id"] = parent_ids[(i - 1) // fanout]
+                batch.append(row)
+            await conn.execute(table.insert(), batch)
+            parent_ids = [row["id"] for row in batch]
+
+
+def include_spec(depth: int) -> dict:
+    """
+    Nested include spec following the chain depth hops down
+    """
+    spec: dict = {}
+    for level in range(depth, 0, -1):
+        spec = {f"children_{level}": {"include": spec} if spec else {}}
+    return spec
+
+
+def count_objects(items: list, depth: int, level: int = 0) -> int:
+    """
+    Number of root and nested objects in a response body
+    """
+    total = len(items)
+    if depth:
+        key = f"children_{level + 1}"
+        for item in items:
+            total += count_objects(item.get(key, []), depth - 1, level + 1)
+    return total
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run(args) -> dict:
+    import httpx
+    from fastapi import FastAPI
+    from sqlalchemy import event
+
+    models = importlib.import_module(f"{APP_PACKAGE}.models")
+    database = importlib.import_module(f"{APP_PACKAGE}.database")
+    handlers = importlib.import_module(f"{APP_PACKAGE}.handlers")
+
+    await seed(database.engine, models, args.rows, args.fanout)
+
+    statements = 0
+
+    def count_statement(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", count_statement)
+
+    app = FastAPI()
+    app.include_router(handlers.router)
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for depth in args.depths:
+            body = {"limit": args.limit, "include": include_spec(depth)}
+            for _ in range(args.warmup):
+                response = await client.post("/model0/query", json=body)
+                response.raise_for_status()
+
+            latencies = []
+            objects = 0
+            statements = 0
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = await client.post("/model0/query", json=body)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+                objects += count_objects(response.json(), depth)
+
+            results.append({
+                "include_depth": depth,
+                "requests": args.requests,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "mean_ms": statistics.mean(latencies) * 1000,
+                "queries_per_request": statements / args.requests,
+                "rows_per_request": objects / args.requests,
+                "rows_per_second": objects / sum(latencies),
+            })
+            print(
+                f"depth {depth}: p50 {results[-1]['p50_ms']:.1f}ms, p99 {results[-1]['p99_ms']:.1f}ms, "
+                f"{results[-1]['queries_per_request']:.1f} queries/request, "
+                f"{results[-1]['rows_per_second']:.0f} rows/s",
+                file=sys.stderr,
+            )
+
+    await database.engine.dispose()
+    return {
+        "config": {
+            "rows": args.rows,
+            "fanout": args.fanout,
+            "width": args.width,
+            "limit": args.limit,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generated query endpoints against SQLite.")
+    parser.add_argument("--rows", type=int, default=100, help="Root rows (Model0)")
+    parser.add_argument("--fanout", type=int, default=3, help="Children per parent at every level")
+    parser.add_argument("--width", type=int, default=10, help="Non-key columns per model")
+    parser.add_argument("--depths", type=int, nargs="+", default=list(range(CHAIN_LENGTH)),
+                        choices=range(CHAIN_LENGTH), help="Include depths to benchmark")
+    parser.add_argument("--limit", type=int, default=100, help="Page size of every request")
+    parser.add_argument("--requests", type=int, default=50, help="Timed requests per depth")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed requests per depth")
+    parser.add_argument("--out", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generate_app(tmp_dir, args.width, args.fanout, args.limit)
+        sys.path.insert(0, tmp_dir)
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        os.environ["MAX_PAGE_SIZE"] = str(args.limit)
+        report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Synthetic model specs for benchmarks
+"""
+from typing import Any, Dict
+
+# Column types cycled through for generated fields
+FIELD_TYPES = [
+    {"type": "String", "length": 100},
+    {"type": "Integer"},
+    {"type": "Float"},
+    {"type": "String"},
+    {"type": "JSON"},
+]
+
+# Named spec shapes: fields per model and children per model
+PROFILES = {
+    # moderately wide tree, a few levels deep
+    "default": {"width": 10, "fanout": 3},
+    # every model has a single child, so the relationship graph is a chain
+    "deep": {"width": 10, "fanout": 1},
+    # few relationships, very wide tables
+    "wide": {"width": 200, "fanout": 8},
+}
+
+
+def model_name(index: int) -> str:
+    return f"Model{index}"
+
+
+def synthesize_spec(n_models: int, width: int = 10, fanout: int = 3) -> Dict[str, Any]:
+    """
+    Build a models spec shaped as a tree: model i (i > 0) belongs to model
+    (i - 1) // fanout through a foreign key, and each parent has a
+    one_to_many relationship back to its children.
+
+    Args:
+        n_models: Number of models
+        width: Number of non-key columns per model
+        fanout: Number of child models per parent model
+    """
+    models: Dict[str, Any] = {}
+    for i in range(n_models):
+        name = model_name(i)
+        fields = [{"name": "id", "type": "Integer", "primary_key": True, "nullable": False}]
+        for j in range(width):
+            field = {"name": f"field_{j}", "nullable": j % 2 == 1}
+            field.update(FIELD_TYPES[j % len(FIELD_TYPES)])
+            fields.append(field)
+        models[name] = {
+            "table_name": f"model_{i}",
+            "fields": fields,
+            "relationships": [],
+        }
+
+    for i in range(1, n_models):
+        parent = model_name((i - 1) // fanout)
+        child = model_name(i)
+        models[child]["fields"].append({
+            "name": "parent_id",
+            "type": "Integer",
+            "foreign_key": {"target": f"{models[parent]['table_name']}.id"},
+            "nullable": False,
+        })
+        models[child]["relationships"].append({
+            "name": "parent",
+            "kind": "many_to_one",
+            "target": parent,
+            "back_populates": f"children_{i}",
+        })
+        models[parent]["relationships"].append({
+            "name": f"children_{i}",
+            "kind": "one_to_many",
+            "target": child,
+            "back_populates": "parent",
+        })
+
+    return {"models": models}
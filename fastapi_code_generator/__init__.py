@@ -0,0 +1,3 @@
+from .codegen import Generator, generate_code
+
+__all__ = ["Generator", "generate_code"]
@@ -1,12 +1,23 @@
 import argparse
-from .codegen import generate_code  # adjust if needed
+from .codegen import Generator
 
 def main():
     parser = argparse.ArgumentParser(description='Generate FastAPI code from OpenAPI spec.')
     parser.add_argument('--input', '-i', required=True, help='Path to OpenAPI spec file (YAML/JSON)')
     parser.add_argument('--output', '-o', required=True, help='Output directory for generated code')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only regenerate outputs whose template or spec slice changed')
+    parser.add_argument('--shard', action='store_true',
+                        help='Generate one models/schemas module per model with lazy package imports')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Number of processes rendering templates in parallel')
+    parser.add_argument('--template-cache-dir',
+                        help="Directory of the compiled template cache (default: Jinja2's temp dir)")
+    parser.add_argument('--no-template-cache', action='store_true',
+                        help='Compile templates from source on every run')
     args = parser.parse_args()
-    generate_code(args.input, args.output)
+    generator = Generator(bytecode_cache=not args.no_template_cache, cache_dir=args.template_cache_dir)
+    generator.generate(args.input, args.output, incremental=args.incremental, shard=args.shard, jobs=args.jobs)
 
 if __name__ == '__main__':
     main() 
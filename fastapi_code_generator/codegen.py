@@ -1,57 +1,299 @@
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 import yaml
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, meta, select_autoescape
 
-def generate_code(input_path: str, output_dir: str):
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+
+# libyaml-backed loader when available; same safe subset of YAML
+SpecLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Manifest of output digests kept in the output dir for incremental runs
+MANIFEST_NAME = '.codegen-manifest.json'
+
+# Generated files: (template, output name, context keys the template reads)
+OUTPUTS = [
+    # ORM models
+    ('models.py.jinja2', 'models.py', ('models',)),
+    # Pydantic schemas
+    ('schemas.py.jinja2', 'schemas.py', ('models',)),
+    # Response serializers
+    ('serializers.py.jinja2', 'serializers.py', ('models',)),
+    # Batching relationship loaders
+    ('loaders.py.jinja2', 'loaders.py', ()),
+    # Bulk writes
+    ('bulk.py.jinja2', 'bulk.py', ()),
+    # Query processor
+    ('query_processor.py.jinja2', 'query_processor.py', ('models', 'options')),
+    # FastAPI handlers
+    ('handlers.py.jinja2', 'handlers.py', ('models', 'options')),
+    # OpenAPI overrides
+    ('openapi.yaml.jinja2', 'openapi.yaml', ('models', 'options')),
+    # Database
+    ('database.py.jinja2', 'database.py', ('options',)),
+]
+
+# Outputs generated only when the named spec option is set:
+# (template, output name, context keys, option)
+OPTIONAL_OUTPUTS = [
+    # Alembic migration creating the declared indexes
+    ('index_migration.py.jinja2', 'migrations/add_spec_indexes.py', ('models', 'options'), 'index_migration'),
+    # Response cache of the query endpoints
+    ('cache.py.jinja2', 'cache.py', ('models', 'options'), 'response_cache'),
+]
+
+# Outputs split into a package with one module per model when sharding:
+# output name -> (package, __init__ template, per-model module template)
+SHARDED_OUTPUTS = {
+    'models.py': ('models', 'models_init.py.jinja2', 'model_module.py.jinja2'),
+    'schemas.py': ('schemas', 'schemas_init.py.jinja2', 'schema_module.py.jinja2'),
+}
+
+
+def field_indexed(field: dict) -> bool:
     """
-    Generate FastAPI code from an OpenAPI/Swagger specification file.
-    
+    Whether a field gets a single-column index: fields declared with index
+    or unique, and foreign keys unless they opt out with index: false.
+    Templates test it as `field is indexed`
+
     Args:
-        input_path: Path to the input YAML/JSON specification file
-        output_dir: Directory where generated code should be placed
+        field: Field spec from the model's fields list
     """
-    # Ensure output dir exists
-    os.makedirs(output_dir, exist_ok=True)
+    if field.get('primary_key'):
+        return False
+    return bool(field.get('unique') or field.get('index', 'foreign_key' in field))
 
-    # Load YAML model spec
-    with open(input_path) as f:
-        spec = yaml.safe_load(f)
-        models = spec.get('models', {})
 
-    # Initialize Jinja2 environment
-    template_dir = os.path.join(os.path.dirname(__file__), 'templates')
-    env = Environment(
-        loader=FileSystemLoader(template_dir),
-        autoescape=select_autoescape(['py', 'yaml'])
-    )
+class Generator:
+    """
+    Reusable code generator.
 
-    def render_template(template_name: str, context: dict, output_name: str):
+    Keeps one Jinja2 environment, so parsed templates and template digests
+    survive across calls. Compiled templates are also stored in a persistent
+    bytecode cache, which Jinja2 validates against the template source, so
+    new processes skip compiling unchanged templates.
+
+    Args:
+        template_dir: Directory containing the Jinja2 templates
+        bytecode_cache: Store compiled templates on disk
+        cache_dir: Directory of the bytecode cache; defaults to Jinja2's
+            per-user temporary directory
+    """
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR, bytecode_cache: bool = True, cache_dir: str = None):
+        self.template_dir = template_dir
+        self.bytecode_cache = bytecode_cache
+        self.cache_dir = cache_dir
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(['py', 'yaml']),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir) if bytecode_cache else None,
+        )
+        self.env.tests['indexed'] = field_indexed
+        # template name -> (digest, up-to-date checks of every source it covers)
+        self._template_hashes = {}
+
+    def render_template(self, template_name: str, context: dict, out_path: str):
         """
-        Render a Jinja2 template to a file in output_dir
+        Render a Jinja2 template to the file at out_path
         """
-        template = env.get_template(template_name)
+        template = self.env.get_template(template_name)
         content = template.render(context)
-        out_path = os.path.join(output_dir, output_name)
         with open(out_path, 'w') as out:
             out.write(content)
         print(f"Generated {out_path}")
 
-    # Context for templates
-    context = {
-        'models': models,
-    }
-
-    # Generate ORM models
-    render_template('models.py.jinja2', context, 'models.py')
-    # Generate Pydantic schemas
-    render_template('schemas.py.jinja2', context, 'schemas.py')
-    # Generate query processor
-    render_template('query_processor.py.jinja2', context, 'query_processor.py')
-    # Generate FastAPI handlers
-    render_template('handlers.py.jinja2', context, 'handlers.py')
-    # Generate OpenAPI overrides
-    render_template('openapi.yaml.jinja2', context, 'openapi.yaml')
-    # Generate database
-    render_template('database.py.jinja2', context, 'database.py')
-
-    print("Code generation complete.")
+    def template_digest(self, template_name: str) -> str:
+        """
+        Hash the sources of a template and the templates it references,
+        reusing the previous digest while none of the files changed
+        """
+        cached = self._template_hashes.get(template_name)
+        if cached and all(uptodate() for uptodate in cached[1]):
+            return cached[0]
+
+        digest = hashlib.sha256()
+        checks = []
+        pending = [template_name]
+        seen = set()
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            source, _, uptodate = self.env.loader.get_source(self.env, name)
+            digest.update(source.encode())
+            checks.append(uptodate)
+            pending.extend(ref for ref in meta.find_referenced_templates(self.env.parse(source)) if ref)
+
+        self._template_hashes[template_name] = (digest.hexdigest(), checks)
+        return digest.hexdigest()
+
+    def generate(
+        self,
+        input_path: str,
+        output_dir: str,
+        incremental: bool = False,
+        shard: bool = False,
+        jobs: int = 1
+    ):
+        """
+        Generate FastAPI code from an OpenAPI/Swagger specification file.
+
+        Args:
+            input_path: Path to the input YAML/JSON specification file
+            output_dir: Directory where generated code should be placed
+            incremental: Skip outputs whose template and spec slice are unchanged
+                since the previous run
+            shard: Generate models and schemas as packages with one lazily
+                imported module per model
+            jobs: Number of worker processes rendering templates in parallel
+        """
+        # Ensure output dir exists
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Load YAML model spec
+        with open(input_path) as f:
+            spec = yaml.load(f, Loader=SpecLoader)
+            models = spec.get('models', {})
+            options = spec.get('options', {})
+
+        # Context for templates
+        context = {
+            'models': models,
+            'options': options,
+        }
+
+        previous = load_manifest(output_dir)
+        manifest = {}
+        tasks = []
+        for template_name, output_name, template_context in plan_outputs(context, shard):
+            out_path = os.path.join(output_dir, *output_name.split('/'))
+            manifest[output_name] = output_digest(self.template_digest(template_name), template_context)
+            if incremental and previous.get(output_name) == manifest[output_name] \
+                    and os.path.exists(out_path):
+                print(f"Unchanged {out_path}")
+                continue
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            tasks.append((template_name, template_context, out_path))
+
+        remove_stale_outputs(output_dir, previous, manifest)
+
+        if jobs > 1 and len(tasks) > 1:
+            settings = (self.template_dir, self.bytecode_cache, self.cache_dir)
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                list(pool.map(_render_in_worker, [settings] * len(tasks), *zip(*tasks)))
+        else:
+            for task in tasks:
+                self.render_template(*task)
+
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        print("Code generation complete.")
+
+
+# Generators of pool worker processes, keyed by their constructor arguments
+_worker_generators = {}
+
+
+def _render_in_worker(settings: tuple, template_name: str, context: dict, out_path: str):
+    """
+    Render one output in a pool worker, reusing the worker's generator
+    """
+    generator = _worker_generators.get(settings)
+    if generator is None:
+        generator = _worker_generators[settings] = Generator(*settings)
+    generator.render_template(template_name, context, out_path)
+
+
+_default_generator = None
+
+
+def get_generator() -> Generator:
+    """
+    Shared Generator used by the module-level helpers
+    """
+    global _default_generator
+    if _default_generator is None:
+        _default_generator = Generator()
+    return _default_generator
+
+
+def render_template(template_name: str, context: dict, out_path: str):
+    """
+    Render a Jinja2 template to the file at out_path
+    """
+    get_generator().render_template(template_name, context, out_path)
+
+
+def output_digest(template_hash: str, context: dict) -> str:
+    """
+    Hash a template digest together with the context the output is rendered from
+    """
+    digest = hashlib.sha256(template_hash.encode())
+    digest.update(json.dumps(context, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def plan_outputs(context: dict, shard: bool = False):
+    """
+    Yield (template, output name, template context) for every generated file
+    """
+    models = context['models']
+    for template_name, output_name, keys in OUTPUTS:
+        if shard and output_name in SHARDED_OUTPUTS:
+            package, init_template, module_template = SHARDED_OUTPUTS[output_name]
+            yield init_template, f'{package}/__init__.py', {'model_names': list(models)}
+            for model_name, model_spec in models.items():
+                yield module_template, f'{package}/{model_name.lower()}.py', {
+                    'model_name': model_name,
+                    'model_spec': model_spec,
+                }
+        else:
+            yield template_name, output_name, {key: context[key] for key in keys}
+    for template_name, output_name, keys, option in OPTIONAL_OUTPUTS:
+        if (context.get('options') or {}).get(option):
+            yield template_name, output_name, {key: context[key] for key in keys}
+
+
+def load_manifest(output_dir: str) -> dict:
+    """
+    Read the manifest of a previous run; missing or corrupt manifests are empty
+    """
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def remove_stale_outputs(output_dir: str, previous: dict, manifest: dict):
+    """
+    Delete files generated by the previous run that this run no longer produces
+    """
+    for output_name in set(previous) - set(manifest):
+        out_path = os.path.join(output_dir, *output_name.split('/'))
+        if os.path.isfile(out_path):
+            os.remove(out_path)
+            print(f"Removed {out_path}")
+        package_dir = os.path.dirname(out_path)
+        if package_dir != os.path.normpath(output_dir) and os.path.isdir(package_dir) \
+                and not os.listdir(package_dir):
+            os.rmdir(package_dir)
+
+
+def generate_code(
+    input_path: str,
+    output_dir: str,
+    incremental: bool = False,
+    shard: bool = False,
+    jobs: int = 1
+):
+    """
+    Generate FastAPI code from an OpenAPI/Swagger specification file,
+    using the shared Generator. See Generator.generate for the arguments.
+    """
+    get_generator().generate(input_path, output_dir, incremental=incremental, shard=shard, jobs=jobs)
@@ -17,10 +17,12 @@ setup(
     install_requires=[
         "fastapi>=0.104.0",  # Latest stable FastAPI
         "uvicorn>=0.24.0",   # ASGI server
-        "sqlalchemy>=2.0.23", # Latest SQLAlchemy with improved typing
+        "sqlalchemy[asyncio]>=2.0.23,<2.2", # Generated pools override QueuePool._do_get
         "pydantic>=2.5.1",   # Latest Pydantic v2
+        "pydantic-settings>=2.1.0",  # BaseSettings for generated database.py
         "python-multipart>=0.0.6",  # For form data handling
         "aiosqlite>=0.19.0",  # Async SQLite support
+        "orjson>=3.9.10",     # JSON encoding of generated responses
         "jinja2>=3.1.2",      # Template engine
         "pyyaml>=6.0.1",      # YAML support for config
         "typer>=0.9.0",       # CLI interface
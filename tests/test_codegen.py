@@ -0,0 +1,224 @@
+import unittest
+import importlib
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import yaml
+
+from fastapi_code_generator import codegen
+
+
+class TestGenerateCode(unittest.TestCase):
+    def setUp(self):
+        # Minimal spec with a single model
+        self.spec = {
+            "models": {
+                "User": {
+                    "table_name": "users",
+                    "fields": [
+                        {"name": "id", "type": "Integer", "primary_key": True, "nullable": False},
+                        {"name": "username", "type": "String", "length": 50, "nullable": False}
+                    ],
+                    "relationships": [
+                        {"name": "posts", "kind": "one_to_many", "target": "Post", "back_populates": "user"}
+                    ]
+                },
+                "Post": {
+                    "table_name": "posts",
+                    "fields": [
+                        {"name": "id", "type": "Integer", "primary_key": True, "nullable": False},
+                        {"name": "user_id", "type": "Integer", "foreign_key": {"target": "users.id"}}
+                    ],
+                    "relationships": [
+                        {"name": "user", "kind": "many_to_one", "target": "User", "back_populates": "posts"}
+                    ]
+                },
+                "Tag": {
+                    "table_name": "tags",
+                    "fields": [
+                        {"name": "id", "type": "Integer", "primary_key": True, "nullable": False}
+                    ],
+                    "relationships": []
+                }
+            }
+        }
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spec_path = os.path.join(self.tmp_dir.name, 'spec.yaml')
+        self.output_dir = os.path.join(self.tmp_dir.name, 'app')
+        self.write_spec()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_spec(self):
+        with open(self.spec_path, 'w') as f:
+            yaml.safe_dump(self.spec, f)
+
+    def generate(self, **kwargs):
+        """Run generate_code and return the names of the outputs it rendered"""
+        original = codegen.Generator.render_template
+        with mock.patch.object(codegen.Generator, 'render_template', autospec=True, side_effect=original) as render:
+            codegen.generate_code(self.spec_path, self.output_dir, **kwargs)
+        return sorted(os.path.basename(call.args[3]) for call in render.call_args_list)
+
+    def test_generates_all_outputs(self):
+        """Test that a full run renders every output and writes the manifest"""
+        rendered = self.generate()
+        self.assertEqual(rendered, sorted(name for _, name, _ in codegen.OUTPUTS))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, codegen.MANIFEST_NAME)))
+
+    def test_incremental_skips_unchanged_outputs(self):
+        """Test that incremental runs only re-render outputs whose inputs changed"""
+        self.generate(incremental=True)
+        self.assertEqual(self.generate(incremental=True), [])
+
+        self.spec["options"] = {"streaming": True}
+        self.write_spec()
+        self.assertEqual(
+            self.generate(incremental=True),
+            ['database.py', 'handlers.py', 'openapi.yaml', 'query_processor.py']
+        )
+
+    def test_incremental_restores_missing_outputs(self):
+        """Test that deleted outputs are regenerated even if the spec is unchanged"""
+        self.generate(incremental=True)
+        os.remove(os.path.join(self.output_dir, 'models.py'))
+        self.assertEqual(self.generate(incremental=True), ['models.py'])
+
+    def test_full_run_ignores_manifest(self):
+        """Test that non-incremental runs always render every output"""
+        self.generate(incremental=True)
+        self.assertEqual(len(self.generate()), len(codegen.OUTPUTS))
+
+    def test_optional_index_migration(self):
+        """Test that the index migration is only generated when enabled"""
+        self.spec["options"] = {"index_migration": True}
+        self.write_spec()
+        self.assertIn('add_spec_indexes.py', self.generate(incremental=True))
+
+        del self.spec["options"]
+        self.write_spec()
+        self.generate(incremental=True)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'migrations')))
+
+    def test_sharded_outputs(self):
+        """Test that sharding writes one models/schemas module per model"""
+        codegen.generate_code(self.spec_path, self.output_dir, shard=True, jobs=2)
+        for package in ('models', 'schemas'):
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(self.output_dir, package))),
+                ['__init__.py', 'post.py', 'tag.py', 'user.py']
+            )
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'models.py')))
+
+    def test_incremental_shards_only_rerender_edited_model(self):
+        """Test that editing one model only re-renders its shards and the shared outputs"""
+        self.generate(incremental=True, shard=True)
+        self.spec["models"]["Tag"]["fields"].append({"name": "label", "type": "String"})
+        self.write_spec()
+        self.assertEqual(
+            self.generate(incremental=True, shard=True),
+            ['handlers.py', 'openapi.yaml', 'query_processor.py', 'serializers.py', 'tag.py', 'tag.py']
+        )
+
+    def test_switching_layout_removes_stale_outputs(self):
+        """Test that outputs of the previous layout are removed"""
+        codegen.generate_code(self.spec_path, self.output_dir, shard=True)
+        codegen.generate_code(self.spec_path, self.output_dir)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'models.py')))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'models')))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'schemas')))
+
+    def test_sharded_models_import_lazily(self):
+        """Test that a sharded package only imports the requested model and its relationship targets"""
+        self.output_dir = os.path.join(self.tmp_dir.name, 'sharded_app')
+        codegen.generate_code(self.spec_path, self.output_dir, shard=True)
+        sys.path.insert(0, self.tmp_dir.name)
+        try:
+            models = importlib.import_module('sharded_app.models')
+            schemas = importlib.import_module('sharded_app.schemas')
+            user = models.User(username="lazy")
+            self.assertIn('sharded_app.models.post', sys.modules)
+            self.assertNotIn('sharded_app.models.tag', sys.modules)
+            self.assertEqual(schemas.UserSchema(id=1, username=user.username).posts, [])
+        finally:
+            sys.path.remove(self.tmp_dir.name)
+            for name in [name for name in sys.modules if name.startswith('sharded_app')]:
+                del sys.modules[name]
+
+
+
+class TestGenerator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.template_dir = os.path.join(self.tmp_dir.name, 'templates')
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+        os.makedirs(self.template_dir)
+        os.makedirs(self.cache_dir)
+        self.write_template('hello.jinja2', 'Hello {{ name }}')
+        self.out_path = os.path.join(self.tmp_dir.name, 'hello.txt')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_template(self, name, source):
+        path = os.path.join(self.template_dir, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        # Make the change visible to mtime based up-to-date checks
+        os.utime(path, (os.path.getmtime(path) + 1,) * 2)
+
+    def render(self, generator):
+        generator.render_template('hello.jinja2', {'name': 'world'}, self.out_path)
+        with open(self.out_path) as f:
+            return f.read()
+
+    def test_bytecode_cache_is_shared_between_generators(self):
+        """Test that compiled templates are loaded from the bytecode cache by new generators"""
+        self.assertEqual(self.render(codegen.Generator(self.template_dir, cache_dir=self.cache_dir)), 'Hello world')
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        generator = codegen.Generator(self.template_dir, cache_dir=self.cache_dir)
+        with mock.patch.object(generator.env, 'compile', wraps=generator.env.compile) as compile_source:
+            self.assertEqual(self.render(generator), 'Hello world')
+        compile_source.assert_not_called()
+
+    def test_template_changes_are_picked_up(self):
+        """Test that a reused generator re-renders and re-hashes edited templates"""
+        generator = codegen.Generator(self.template_dir, cache_dir=self.cache_dir)
+        digest = generator.template_digest('hello.jinja2')
+        self.assertEqual(generator.template_digest('hello.jinja2'), digest)
+        self.render(generator)
+
+        self.write_template('hello.jinja2', 'Bye {{ name }}')
+        self.assertNotEqual(generator.template_digest('hello.jinja2'), digest)
+        self.assertEqual(self.render(generator), 'Bye world')
+
+    def test_without_bytecode_cache(self):
+        """Test that the bytecode cache can be disabled"""
+        generator = codegen.Generator(self.template_dir, bytecode_cache=False)
+        self.assertIsNone(generator.env.bytecode_cache)
+        self.assertEqual(self.render(generator), 'Hello world')
+
+    def test_field_indexed(self):
+        """Test which fields get a single-column index, in Python and as a template test"""
+        foreign_key = {"name": "user_id", "type": "Integer", "foreign_key": {"target": "users.id"}}
+        cases = [
+            ({"name": "id", "type": "Integer", "primary_key": True, "unique": True}, False),
+            ({"name": "title", "type": "String"}, False),
+            ({"name": "title", "type": "String", "index": True}, True),
+            ({"name": "email", "type": "String", "unique": True}, True),
+            ({"name": "email", "type": "String", "unique": True, "index": False}, True),
+            (foreign_key, True),
+            (dict(foreign_key, index=False), False),
+        ]
+        template = codegen.Generator(bytecode_cache=False).env.from_string('{{ field is indexed }}')
+        for field, indexed in cases:
+            self.assertIs(codegen.field_indexed(field), indexed)
+            self.assertEqual(template.render(field=field), str(indexed))
+
+
+if __name__ == '__main__':
+    unittest.main()
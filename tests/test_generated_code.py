@@ -1,13 +1,24 @@
+import asyncio
+import base64
 import unittest
+from unittest import mock
+import json
 import os
 import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import tempfile
+import yaml
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import select, event
+from sqlalchemy.exc import InvalidRequestError, TimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker, selectinload
+from sqlalchemy.pool import StaticPool
 from typing import List, Dict, Any
 
-from ..codegen import render_template
+from fastapi_code_generator.codegen import get_generator, render_template
 
-class TestGeneratedCode(unittest.TestCase):
+class TestGeneratedCode(unittest.IsolatedAsyncioTestCase):
     query_with_include = None  # Will be set in setUpClass
     
     @classmethod
@@ -28,6 +39,12 @@ class TestGeneratedCode(unittest.TestCase):
                         "kind": "one_to_many",
                         "target": "Post",
                         "back_populates": "user"
+                    },
+                    {
+                        "name": "reviews",
+                        "kind": "one_to_many",
+                        "target": "Review",
+                        "back_populates": "author"
                     }
                 ]
             },
@@ -50,6 +67,45 @@ class TestGeneratedCode(unittest.TestCase):
                         "kind": "many_to_one",
                         "target": "User",
                         "back_populates": "posts"
+                    },
+                    {
+                        "name": "reviews",
+                        "kind": "one_to_many",
+                        "target": "Review",
+                        "back_populates": "post"
+                    }
+                ]
+            },
+            "Review": {
+                "table_name": "reviews",
+                "fields": [
+                    {"name": "id", "type": "Integer", "primary_key": True, "nullable": False},
+                    {"name": "body", "type": "String", "nullable": False},
+                    {
+                        "name": "post_id",
+                        "type": "Integer",
+                        "foreign_key": {"target": "posts.id"},
+                        "nullable": False
+                    },
+                    {
+                        "name": "user_id",
+                        "type": "Integer",
+                        "foreign_key": {"target": "users.id"},
+                        "nullable": False
+                    }
+                ],
+                "relationships": [
+                    {
+                        "name": "post",
+                        "kind": "many_to_one",
+                        "target": "Post",
+                        "back_populates": "reviews"
+                    },
+                    {
+                        "name": "author",
+                        "kind": "many_to_one",
+                        "target": "User",
+                        "back_populates": "reviews"
                     }
                 ]
             }
@@ -66,6 +122,7 @@ class TestGeneratedCode(unittest.TestCase):
         # Generate all necessary files
         context = {
             'models': cls.test_models,
+            'options': {'instrumentation': True},
             'is_test': True  # Flag to indicate test environment
         }
         cls.generate_code_files(context)
@@ -76,7 +133,13 @@ class TestGeneratedCode(unittest.TestCase):
         
         # Import generated modules
         from test_output.models import Base, User, Post
-        from test_output.query_processor import query_with_include, MODEL_REGISTRY
+        from test_output.query_processor import (
+            query_with_include, query_page, query_plan_cache_info, MODEL_REGISTRY, QueryValidationError,
+            prepare_statement, stream_partitions, is_projection, query_aggregate, QueryCostError, include_tree
+        )
+        from test_output.serializers import serialize_row, dump_rows
+        from test_output.loaders import load_related, request_loaders
+        from test_output import bulk
         from test_output.schemas import UserSchema, PostSchema
         
         # Store imports as class attributes
@@ -87,11 +150,20 @@ class TestGeneratedCode(unittest.TestCase):
         cls.UserSchema = UserSchema
         cls.PostSchema = PostSchema
         cls.query_with_include = staticmethod(query_with_include)  # Make it a static method
-        
-        # Set up in-memory SQLite database
-        cls.engine = create_engine('sqlite:///:memory:')
-        cls.Base.metadata.create_all(cls.engine)
-        cls.Session = sessionmaker(bind=cls.engine)
+        cls.query_plan_cache_info = staticmethod(query_plan_cache_info)
+        cls.query_page = staticmethod(query_page)
+        cls.QueryValidationError = QueryValidationError
+        cls.QueryCostError = QueryCostError
+        cls.prepare_statement = staticmethod(prepare_statement)
+        cls.stream_partitions = staticmethod(stream_partitions)
+        cls.serialize_row = staticmethod(serialize_row)
+        cls.is_projection = staticmethod(is_projection)
+        cls.include_tree = staticmethod(include_tree)
+        cls.query_aggregate = staticmethod(query_aggregate)
+        cls.dump_rows = staticmethod(dump_rows)
+        cls.load_related = staticmethod(load_related)
+        cls.request_loaders = staticmethod(request_loaders)
+        cls.bulk = bulk
 
     @classmethod
     def generate_code_files(cls, context: Dict[str, Any]) -> None:
@@ -100,6 +172,10 @@ class TestGeneratedCode(unittest.TestCase):
             ('models.py.jinja2', 'models.py'),
             ('schemas.py.jinja2', 'schemas.py'),
             ('query_processor.py.jinja2', 'query_processor.py'),
+            ('serializers.py.jinja2', 'serializers.py'),
+            ('loaders.py.jinja2', 'loaders.py'),
+            ('bulk.py.jinja2', 'bulk.py'),
+            ('cache.py.jinja2', 'cache.py'),
             ('database.py.jinja2', 'database.py')
         ]
         
@@ -107,15 +183,24 @@ class TestGeneratedCode(unittest.TestCase):
             output_path = os.path.join(cls.test_output_dir, output)
             render_template(template, context, output_path)
 
-    def setUp(self):
-        """Set up test database with sample data"""
-        self.session = self.Session()
+    async def asyncSetUp(self):
+        """Set up in-memory SQLite database with sample data"""
+        self.engine = create_async_engine(
+            'sqlite+aiosqlite://',
+            connect_args={'check_same_thread': False},
+            poolclass=StaticPool,
+        )
+        async with self.engine.begin() as conn:
+            await conn.run_sync(self.Base.metadata.create_all)
+        self.session = sessionmaker(
+            bind=self.engine, class_=AsyncSession, expire_on_commit=False
+        )()
         
         # Create test users
         self.user1 = self.User(username="testuser1", email="test1@example.com")
         self.user2 = self.User(username="testuser2", email="test2@example.com")
         self.session.add_all([self.user1, self.user2])
-        self.session.commit()
+        await self.session.commit()
         
         # Create test posts
         self.post1 = self.Post(
@@ -134,17 +219,17 @@ class TestGeneratedCode(unittest.TestCase):
             user_id=self.user2.id
         )
         self.session.add_all([self.post1, self.post2, self.post3])
-        self.session.commit()
+        await self.session.commit()
+        self.session.expunge_all()
 
-    def tearDown(self):
+    async def asyncTearDown(self):
         """Clean up after each test"""
-        self.session.close()
-        self.Base.metadata.drop_all(self.engine)
-        self.Base.metadata.create_all(self.engine)
+        await self.session.close()
+        await self.engine.dispose()
 
-    def test_basic_query(self):
+    async def test_basic_query(self):
         """Test basic query without includes or filters"""
-        results = self.query_with_include(
+        results = await self.query_with_include(
             self.session,
             self.User,
             filters={},
@@ -154,9 +239,9 @@ class TestGeneratedCode(unittest.TestCase):
         self.assertEqual(len(results), 2)  # Should return both users
         self.assertIsInstance(results[0], self.User)
 
-    def test_query_with_filter(self):
+    async def test_query_with_filter(self):
         """Test querying with filters"""
-        results = self.query_with_include(
+        results = await self.query_with_include(
             self.session,
             self.User,
             filters={"username": "testuser1"},
@@ -166,9 +251,9 @@ class TestGeneratedCode(unittest.TestCase):
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0].username, "testuser1")
 
-    def test_query_with_include(self):
+    async def test_query_with_include(self):
         """Test querying with relationship includes"""
-        results = self.query_with_include(
+        results = await self.query_with_include(
             self.session,
             self.User,
             filters={"username": "testuser1"},
@@ -179,9 +264,9 @@ class TestGeneratedCode(unittest.TestCase):
         self.assertEqual(len(results[0].posts), 2)  # User1 has 2 posts
             
 
-    def test_query_with_nested_filter(self):
+    async def test_query_with_nested_filter(self):
         """Test querying with filters on related models"""
-        results = self.query_with_include(
+        results = await self.query_with_include(
             self.session,
             self.Post,
             filters={},
@@ -195,9 +280,124 @@ class TestGeneratedCode(unittest.TestCase):
         self.assertEqual(len(results), 2)  # Should find 2 posts by testuser1
         self.assertEqual(results[0].user.username, "testuser1")
 
-    def test_query_with_field_selection(self):
+    async def test_loader_strategy_per_relationship_kind(self):
+        """Test that many_to_one includes load in the root query and filtered ones reuse its join"""
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(self.engine.sync_engine, "before_cursor_execute", listener)
+        try:
+            results = await self.query_with_include(self.session, self.Post, include_spec={"user": {}})
+            self.assertEqual(len(statements), 1)
+            self.assertEqual({post.user.username for post in results}, {"testuser1", "testuser2"})
+
+            statements.clear()
+            results = await self.query_with_include(
+                self.session,
+                self.Post,
+                include_spec={"user": {"filters": {"username": "testuser2"}}}
+            )
+            self.assertEqual(len(statements), 1)
+            self.assertEqual(statements[0].count("JOIN"), 1)
+            self.assertEqual([post.user.username for post in results], ["testuser2"])
+
+            statements.clear()
+            results = await self.query_with_include(self.session, self.User, include_spec={"posts": {}})
+            self.assertEqual(len(statements), 2)
+        finally:
+            event.remove(self.engine.sync_engine, "before_cursor_execute", listener)
+
+    async def test_one_to_many_filter_uses_exists(self):
+        """Test that a filtered collection selects each root once and only loads matching children"""
+        self.session.add(self.Post(title="Test Post 1", content="Copy", user_id=self.user1.id))
+        await self.session.commit()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(self.engine.sync_engine, "before_cursor_execute", listener)
+        try:
+            results, _ = await self.query_page(
+                self.session,
+                self.User,
+                10,
+                include_spec={"posts": {"filters": {"title": "Test Post 1"}}}
+            )
+        finally:
+            event.remove(self.engine.sync_engine, "before_cursor_execute", listener)
+
+        self.assertEqual([user.username for user in results], ["testuser1"])
+        self.assertEqual([post.content for post in results[0].posts], ["Content 1", "Copy"])
+        self.assertIn("EXISTS", statements[0])
+        self.assertNotIn("JOIN", statements[0])
+
+        # The filter values are bound per request; the cached statement is reused
+        results, _ = await self.query_page(
+            self.session,
+            self.User,
+            10,
+            include_spec={"posts": {"filters": {"title": "Test Post 3"}}}
+        )
+        self.assertEqual([user.username for user in results], ["testuser2"])
+        self.assertEqual([post.title for post in results[0].posts], ["Test Post 3"])
+
+    async def test_nested_filter_through_collection(self):
+        """Test filters below a collection restrict every level they pass through"""
+        results = await self.query_with_include(
+            self.session,
+            self.User,
+            include_spec={
+                "posts": {
+                    "fields": ["title"],
+                    "include": {"user": {"filters": {"username": "testuser2"}}}
+                }
+            }
+        )
+        self.assertEqual([user.username for user in results], ["testuser2"])
+        self.assertEqual([post.title for post in results[0].posts], ["Test Post 3"])
+        self.assertEqual(results[0].posts[0].user.username, "testuser2")
+
+    async def test_filtered_paths_joining_the_same_table(self):
+        """Test that filtered paths reaching the same table are joined through separate aliases"""
+        Review = self.MODEL_REGISTRY["Review"]
+        self.session.add_all([
+            Review(body="Review 1", post_id=self.post1.id, user_id=self.user2.id),
+            Review(body="Review 2", post_id=self.post3.id, user_id=self.user1.id),
+            Review(body="Review 3", post_id=self.post1.id, user_id=self.user1.id),
+        ])
+        await self.session.commit()
+        self.session.expunge_all()
+
+        results = await self.query_with_include(
+            self.session,
+            Review,
+            include_spec={
+                "author": {"filters": {"username": "testuser2"}},
+                "post": {"include": {"user": {"filters": {"username": "testuser1"}}}}
+            }
+        )
+        self.assertEqual([review.body for review in results], ["Review 1"])
+        self.assertEqual(results[0].author.username, "testuser2")
+        self.assertEqual(results[0].post.title, "Test Post 1")
+        self.assertEqual(results[0].post.user.username, "testuser1")
+
+        # A filtered collection below a joined hop correlates with its alias
+        results = await self.query_with_include(
+            self.session,
+            Review,
+            include_spec={
+                "author": {"fields": ["username"]},
+                "post": {"include": {"reviews": {"filters": {"body": "Review 3"}}}}
+            }
+        )
+        self.assertEqual([review.body for review in results], ["Review 1", "Review 3"])
+        self.assertEqual([r.body for r in results[0].post.reviews], ["Review 3"])
+
+    async def test_foreign_keys_are_indexed(self):
+        """Test that foreign key columns get an index"""
+        self.assertIn("ix_posts_user_id", {index.name for index in self.Post.__table__.indexes})
+
+    async def test_query_with_field_selection(self):
         """Test querying with specific field selection"""
-        results = self.query_with_include(
+        results = await self.query_with_include(
             self.session,
             self.User,
             filters={},
@@ -206,9 +406,39 @@ class TestGeneratedCode(unittest.TestCase):
         )
         self.assertEqual(len(results), 2)
 
-    def test_query_with_complex_include(self):
+    async def test_projection_loads_requested_and_key_columns(self):
+        """Test that projections select key columns plus the requested fields at every level"""
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(self.engine.sync_engine, "before_cursor_execute", listener)
+        try:
+            results = await self.query_with_include(
+                self.session,
+                self.User,
+                fields=["username"],
+                include_spec={"posts": {"fields": ["title"]}}
+            )
+        finally:
+            event.remove(self.engine.sync_engine, "before_cursor_execute", listener)
+
+        self.assertTrue(all("email" not in statement and "content" not in statement for statement in statements))
+        self.assertEqual(
+            self.serialize_row(results[0], {"posts": {}}),
+            {
+                "id": self.user1.id,
+                "username": "testuser1",
+                "posts": [
+                    {"id": self.post1.id, "title": "Test Post 1", "user_id": self.user1.id},
+                    {"id": self.post2.id, "title": "Test Post 2", "user_id": self.user1.id},
+                ],
+            }
+        )
+        self.assertTrue(self.is_projection([], {"posts": {"fields": ["title"]}}))
+        self.assertFalse(self.is_projection([], {"posts": {}}))
+
+    async def test_query_with_complex_include(self):
         """Test querying with nested includes and field selection"""
-        results = self.query_with_include(
+        results = await self.query_with_include(
             self.session,
             self.Post,
             filters={},
@@ -225,16 +455,126 @@ class TestGeneratedCode(unittest.TestCase):
         self.assertIsNotNone(results[0].user)
         self.assertIsNotNone(results[0].user.username)
 
-    def test_schema_serialization(self):
+    async def test_query_plan_cache(self):
+        """Test that requests of the same shape reuse the cached statement"""
+        await self.query_with_include(
+            self.session,
+            self.User,
+            filters={"username": "testuser1"},
+            include_spec={"posts": {}}
+        )
+        hits = self.query_plan_cache_info().hits
+        results = await self.query_with_include(
+            self.session,
+            self.User,
+            filters={"username": "testuser2"},
+            include_spec={"posts": {}}
+        )
+        self.assertEqual(self.query_plan_cache_info().hits, hits + 1)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].username, "testuser2")
+        self.assertEqual(len(results[0].posts), 1)  # User2 has 1 post
+
+    async def test_query_rejects_undeclared_paths(self):
+        """Test that unknown include paths, fields and filters are rejected before querying"""
+        invalid_requests = [
+            {"include_spec": {"comments": {}}},
+            {"include_spec": {"posts": {"include": {"user": {"include": {"posts": {"include": {"user": {}}}}}}}}},
+            {"include_spec": {"posts": {"fields": ["username"]}}},
+            {"filters": {"password": "secret"}},
+            {"fields": ["posts"]},
+        ]
+        for kwargs in invalid_requests:
+            with self.assertRaises(self.QueryValidationError):
+                await self.query_with_include(self.session, self.User, **kwargs)
+
+    async def test_query_cost_budgets(self):
+        """Test that requests over the estimated or loaded row budgets are rejected"""
+        from test_output import query_processor
+
+        self.assertEqual(query_processor.RELATIONSHIP_FANOUT, {
+            "User": {"posts": 10, "reviews": 10},
+            "Post": {"user": 1, "reviews": 10},
+            "Review": {"post": 1, "author": 1},
+        })
+        self.assertEqual(query_processor.rows_per_root("User", ("posts", "posts.user")), 21)
+        with mock.patch.object(query_processor, "MAX_ESTIMATED_ROWS", 100):
+            with self.assertRaises(self.QueryCostError):
+                await self.query_page(self.session, self.User, 10, include_spec={"posts": {}})
+            rows, _ = await self.query_page(self.session, self.User, 8, include_spec={"posts": {}})
+            self.assertEqual(len(rows), 2)
+        with mock.patch.object(query_processor, "MAX_INCLUDE_PATHS", 1):
+            with self.assertRaises(self.QueryCostError):
+                await self.query_with_include(self.session, self.User, include_spec={"posts": {"include": {"user": {}}}})
+
+        # The two users and three posts are loaded while executing; rows
+        # already in the identity map aren't loaded again
+        self.session.expunge_all()
+        with mock.patch.object(query_processor, "MAX_LOADED_ROWS", 4):
+            with self.assertRaises(self.QueryCostError):
+                await self.query_with_include(self.session, self.User, include_spec={"posts": {}})
+            self.assertNotIn(query_processor.ROW_BUDGET_KEY, self.session.info)
+            self.session.expunge_all()
+            self.assertEqual(len(await self.query_with_include(self.session, self.Post)), 3)
+
+    async def test_keyset_pagination(self):
+        """Test paging through results with a primary key cursor"""
+        first_page, cursor = await self.query_page(self.session, self.Post, 2)
+        self.assertEqual([p.title for p in first_page], ["Test Post 1", "Test Post 2"])
+        self.assertIsNotNone(cursor)
+
+        second_page, cursor = await self.query_page(self.session, self.Post, 2, cursor=cursor)
+        self.assertEqual([p.title for p in second_page], ["Test Post 3"])
+        self.assertIsNone(cursor)
+
+        # Cursors are client input: anything but the key's scalar values is a 400
+        malformed = ["not-a-cursor", {"a": 1}, [{"a": 1}], [[1]], [None], [True], ["1"], [1.5], [1, 2]]
+        for value in malformed:
+            cursor = value if isinstance(value, str) else base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+            with self.assertRaises(self.QueryValidationError):
+                await self.query_page(self.session, self.Post, 2, cursor=cursor)
+
+    async def test_stream_partitions(self):
+        """Test streaming query results in fixed-size chunks"""
+        stmt, params = self.prepare_statement(
+            self.Post,
+            include_spec={"user": {"filters": {"username": "testuser1"}}}
+        )
+        chunks = [
+            [post.title for post in rows]
+            async for rows in self.stream_partitions(self.session, stmt, params, 1)
+        ]
+        self.assertEqual(sorted(chunks), [["Test Post 1"], ["Test Post 2"]])
+
+    def test_openapi_query_request_matches_schema(self):
+        """Test that openapi.yaml documents every QueryRequest field"""
+        from test_output.schemas import QueryRequest
+        spec = yaml.safe_load(get_generator().env.get_template('openapi.yaml.jinja2').render(models=self.test_models))
+        self.assertEqual(set(spec["components"]["schemas"]["QueryRequest"]["properties"]), set(QueryRequest.model_fields))
+
+    def test_openapi_filter_values_accept_null(self):
+        """Test that openapi.yaml allows null filter values, which match NULL"""
+        schemas = yaml.safe_load(get_generator().env.get_template('openapi.yaml.jinja2').render(models=self.test_models))["components"]["schemas"]
+        values = [
+            schemas["QueryRequest"]["properties"]["filters"]["additionalProperties"],
+            schemas["NestedInclude"]["properties"]["filters"]["additionalProperties"],
+            schemas["FilterOperators"]["properties"]["eq"],
+        ]
+        for value in values:
+            self.assertTrue(any(branch.get("nullable") for branch in value["oneOf"]))
+
+    async def test_schema_serialization(self):
         """Test that generated Pydantic schemas work correctly"""
-        user = self.session.query(self.User).first()
-        # Only validate the user without loading relationships
+        user = await self.session.scalar(
+            select(self.User).options(selectinload(self.User.posts))
+        )
+        # Validate the user with its relationships eagerly loaded
         user_schema = self.UserSchema.model_validate(user, from_attributes=True)
         self.assertEqual(user_schema.username, user.username)
         self.assertEqual(user_schema.email, user.email)
         
         # Test relationship serialization separately
-        post = self.session.query(self.Post).first()
+        post = await self.session.scalar(select(self.Post))
         post_schema = self.PostSchema.model_validate(post, from_attributes=True)
         self.assertEqual(post_schema.title, post.title)
         self.assertEqual(post_schema.content, post.content)
@@ -242,5 +582,588 @@ class TestGeneratedCode(unittest.TestCase):
         # Test that relationships are properly typed
         self.assertIsInstance(user_schema.posts, list)
 
+    async def test_serializers_match_schemas(self):
+        """Test that the fast-path serializers produce the same JSON as the schemas"""
+        from test_output.serializers import serialize_user
+        users = await self.query_with_include(self.session, self.User, include_spec={"posts": {}})
+        expected = [self.UserSchema.model_validate(user).model_dump(exclude_unset=True) for user in users]
+        self.assertEqual(json.loads(self.dump_rows(serialize_user, users, {"posts": {}})), expected)
+
+        # Relationships that weren't included are left out, not lazy-loaded
+        posts = await self.query_with_include(self.session, self.Post)
+        self.assertNotIn("user", self.serialize_row(posts[0], {}))
+
+    async def test_serializers_follow_the_include_tree(self):
+        """Test that an include leading back to its root row is serialized once"""
+        self.assertEqual(
+            self.include_tree({"posts": {"fields": ["title"], "include": {"user": {}}}}),
+            {"posts": {"user": {}}}
+        )
+        users = await self.query_with_include(self.session, self.User, include_spec={"posts": {"include": {"user": {}}}})
+        # The root user and the posts' user are the same object
+        self.assertIs(users[0].posts[0].user, users[0])
+
+        data = self.serialize_row(users[0], {"posts": {"user": {}}})
+        self.assertEqual([post["title"] for post in data["posts"]], ["Test Post 1", "Test Post 2"])
+        self.assertEqual(data["posts"][0]["user"], {"id": self.user1.id, "username": "testuser1", "email": "test1@example.com"})
+        self.assertEqual(self.serialize_row(users[0], {}), data["posts"][0]["user"])
+
+    async def test_schema_serialization_skips_unloaded_relationships(self):
+        """Test that validating an object never lazy-loads relationships"""
+        user = await self.session.scalar(select(self.User))
+        user_schema = self.UserSchema.model_validate(user)
+        self.assertEqual(user_schema.username, user.username)
+        self.assertEqual(user_schema.posts, [])
+
+    async def test_relationships_raise_instead_of_lazy_loading(self):
+        """Test that touching a relationship that wasn't loaded raises"""
+        user = await self.session.scalar(select(self.User))
+        with self.assertRaises(InvalidRequestError):
+            user.posts
+
+    async def test_relationship_loads_are_batched(self):
+        """Test that loads requested together run one IN query per relationship"""
+        posts = (await self.session.scalars(select(self.Post).order_by(self.Post.id))).all()
+        users = (await self.session.scalars(select(self.User).order_by(self.User.id))).all()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(self.engine.sync_engine, "before_cursor_execute", listener)
+        try:
+            authors, collections = await asyncio.gather(
+                self.request_loaders(self.session).load_many(posts, "user"),
+                asyncio.gather(*(self.load_related(self.session, user, "posts") for user in users)),
+            )
+            self.assertEqual(len(statements), 2)
+            self.assertTrue(all(" IN " in statement for statement in statements))
+            self.assertEqual([user.username for user in authors], ["testuser1", "testuser1", "testuser2"])
+            self.assertEqual([[post.title for post in posts] for posts in collections],
+                             [["Test Post 1", "Test Post 2"], ["Test Post 3"]])
+
+            # Loaded relationships are set on the instances and not queried again
+            statements.clear()
+            self.assertEqual(len(users[0].posts), 2)
+            await self.load_related(self.session, users[0], "posts")
+            self.assertEqual(statements, [])
+        finally:
+            event.remove(self.engine.sync_engine, "before_cursor_execute", listener)
+
+    async def test_filter_operators(self):
+        """Test typed filter operators and their compiled predicates"""
+        async def titles(**kwargs):
+            rows = await self.query_with_include(self.session, self.Post, **kwargs)
+            return sorted(post.title for post in rows)
+
+        self.assertEqual(await titles(filters={"id": {"in": [1, 3]}}), ["Test Post 1", "Test Post 3"])
+        self.assertEqual(await titles(filters={"id": {"in": [2]}}), ["Test Post 2"])
+        self.assertEqual(await titles(filters={"id": {"gt": 1, "lte": 2}}), ["Test Post 2"])
+        self.assertEqual(await titles(filters={"title": {"prefix": "Test Post"}}), ["Test Post 1", "Test Post 2", "Test Post 3"])
+        self.assertEqual(await titles(filters={"title": {"prefix": "Test%"}}), [])
+        self.assertEqual(await titles(filters={"title": {"is_null": False}, "user_id": 2}), ["Test Post 3"])
+        self.assertEqual(await titles(filters={"title": {"is_null": True}}), [])
+        # Equality with null is an IS NULL test, on every field type
+        self.assertEqual(await titles(filters={"user_id": None}), [])
+        self.assertEqual(await titles(filters={"content": {"eq": None}}), [])
+        stmt, _ = self.prepare_statement(self.Post, filters={"user_id": None})
+        self.assertIn("posts.user_id IS NULL", str(stmt))
+
+        # Operators apply to include filters and to the included rows
+        users = await self.query_with_include(
+            self.session,
+            self.User,
+            include_spec={"posts": {"filters": {"title": {"prefix": "Test"}, "id": {"in": [2, 3]}}}}
+        )
+        self.assertEqual({user.username: [post.id for post in user.posts] for user in users},
+                         {"testuser1": [2], "testuser2": [3]})
+
+        stmt, params = self.prepare_statement(self.Post, filters={"title": {"prefix": "a_b"}, "id": {"in": [1, 2]}})
+        sql = str(stmt)
+        self.assertIn("posts.title LIKE ", sql)
+        self.assertIn("posts.id IN (", sql)
+        self.assertEqual(params["root__title__prefix"], "a\\_b%")
+
+        for filters in ({"title": {"gt": 1}}, {"id": {"prefix": "1"}}, {"id": {"in": 1}},
+                        {"id": {"is_null": "yes"}}, {"id": {}}, {"id": "1"}):
+            with self.assertRaises(self.QueryValidationError):
+                await self.query_with_include(self.session, self.Post, filters=filters)
+
+    async def test_aggregates(self):
+        """Test counts and aggregates computed in one GROUP BY statement"""
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(self.engine.sync_engine, "before_cursor_execute", listener)
+        try:
+            rows = await self.query_aggregate(
+                self.session,
+                self.Post,
+                group_by=["user_id"],
+                aggregates={"max": ["id"], "avg": ["id"]},
+                count=True,
+            )
+        finally:
+            event.remove(self.engine.sync_engine, "before_cursor_execute", listener)
+        self.assertEqual(len(statements), 1)
+        self.assertIn("GROUP BY", statements[0])
+        self.assertEqual(rows, [
+            {"user_id": self.user1.id, "count": 2, "avg_id": 1.5, "max_id": 2},
+            {"user_id": self.user2.id, "count": 1, "avg_id": 3.0, "max_id": 3},
+        ])
+
+        # Include filters restrict the rows counted, without multiplying them
+        rows = await self.query_aggregate(
+            self.session,
+            self.User,
+            include_spec={"posts": {"filters": {"user_id": self.user1.id}}},
+            count=True,
+        )
+        self.assertEqual(rows, [{"count": 1}])
+        rows = await self.query_aggregate(self.session, self.Post, filters={"title": "missing"}, count=True)
+        self.assertEqual(rows, [{"count": 0}])
+
+        # Filtered paths reaching the same table are joined through separate aliases
+        Review = self.MODEL_REGISTRY["Review"]
+        self.session.add_all([
+            Review(body="Review 1", post_id=self.post1.id, user_id=self.user2.id),
+            Review(body="Review 2", post_id=self.post3.id, user_id=self.user1.id),
+            Review(body="Review 3", post_id=self.post2.id, user_id=self.user2.id),
+            Review(body="Review 4", post_id=self.post2.id, user_id=self.user2.id),
+        ])
+        await self.session.commit()
+        rows = await self.query_aggregate(
+            self.session,
+            Review,
+            include_spec={
+                "author": {"filters": {"username": "testuser2"}},
+                "post": {"include": {"user": {"filters": {"username": "testuser1"}}}}
+            },
+            group_by=["post_id"],
+            count=True,
+        )
+        self.assertEqual(rows, [{"post_id": self.post1.id, "count": 1}, {"post_id": self.post2.id, "count": 2}])
+
+        # More groups than limit is an error rather than a cut off result
+        rows = await self.query_aggregate(self.session, self.Post, group_by=["user_id"], count=True, limit=2)
+        self.assertEqual(len(rows), 2)
+        with self.assertRaises(self.QueryValidationError):
+            await self.query_aggregate(self.session, self.Post, group_by=["user_id"], count=True, limit=1)
+
+        with self.assertRaises(self.QueryValidationError):
+            await self.query_aggregate(self.session, self.Post, aggregates={"sum": ["title"]})
+        with self.assertRaises(self.QueryValidationError):
+            await self.query_aggregate(self.session, self.Post, aggregates={"median": ["id"]})
+
+    async def test_bulk_writes(self):
+        """Test that bulk inserts, upserts and deletes return the affected keys in order"""
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(self.engine.sync_engine, "before_cursor_execute", listener)
+        try:
+            rows = [{"username": f"bulk{i}", "email": f"bulk{i}@example.com"} for i in range(5)]
+            rows.insert(2, {"id": 100, "username": "keyed", "email": "keyed@example.com"})
+            keys = await self.bulk.bulk_insert(self.session, self.User, rows, chunk_size=2)
+            self.assertEqual(keys, [3, 4, 100, 5, 6, 7])
+
+            # Rows setting their keys are inserted with one executemany per chunk
+            statements.clear()
+            rows = [{"id": i, "username": f"keyed{i}", "email": f"keyed{i}@example.com"} for i in range(200, 205)]
+            keys = await self.bulk.bulk_insert(self.session, self.User, rows, chunk_size=2)
+            self.assertEqual(keys, list(range(200, 205)))
+            self.assertEqual(len(statements), 3)
+            self.assertNotIn("RETURNING", statements[0])
+        finally:
+            event.remove(self.engine.sync_engine, "before_cursor_execute", listener)
+
+        keys = await self.bulk.bulk_upsert(self.session, self.User, [
+            {"id": 100, "username": "renamed", "email": "renamed@example.com"},
+            {"id": 101, "username": "new", "email": "new@example.com"},
+        ], chunk_size=10)
+        self.assertEqual(keys, [100, 101])
+        with self.assertRaises(self.bulk.BulkWriteError):
+            await self.bulk.bulk_upsert(self.session, self.User, [{"username": "no key"}], chunk_size=10)
+
+        keys = await self.bulk.bulk_delete(self.session, self.User, [100, 101, 999, *range(200, 205)], chunk_size=2)
+        self.assertEqual(sorted(keys), [100, 101, *range(200, 205)])
+        await self.session.commit()
+        usernames = (await self.session.scalars(select(self.User.username).where(self.User.id >= 3))).all()
+        self.assertEqual(usernames, [f"bulk{i}" for i in range(5)])
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+    """Response cache of the generated query endpoints"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Reuses the modules generated for TestGeneratedCode
+        TestGeneratedCode.setUpClass()
+        from test_output import cache
+        cls.cache = cache
+
+    async def asyncSetUp(self):
+        self.backend = self.cache.MemoryCacheBackend(max_bytes=10)
+        self.cache.set_cache_backend(self.backend)
+        self.engine = create_async_engine(
+            'sqlite+aiosqlite://',
+            connect_args={'check_same_thread': False},
+            poolclass=StaticPool,
+        )
+        async with self.engine.begin() as conn:
+            await conn.run_sync(TestGeneratedCode.Base.metadata.create_all)
+        self.session = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)()
+
+    async def asyncTearDown(self):
+        self.cache.set_cache_backend(None)
+        await self.session.close()
+        await self.engine.dispose()
+
+    def cache_response(self, key, content, tables):
+        self.cache.store(key, self.cache.CachedResponse(content, None), tables, self.cache.table_versions(tables))
+
+    def test_memory_backend_lru_and_ttl(self):
+        """Test that the in-process backend evicts by size and expires entries"""
+        now = [0.0]
+        backend = self.cache.MemoryCacheBackend(max_bytes=10, clock=lambda: now[0])
+        for key in ("a", "b", "c"):
+            backend.set(key, self.cache.CachedResponse(b"1234", None), ("users",), ttl=5)
+        self.assertIsNone(backend.get("a"))  # least recently used, evicted
+        self.assertEqual(backend.get("b").content, b"1234")
+        self.assertEqual(backend.size, 8)
+
+        now[0] = 5.0
+        self.assertIsNone(backend.get("b"))
+        backend.set("big", self.cache.CachedResponse(b"x" * 11, None), ("users",), ttl=5)
+        self.assertIsNone(backend.get("big"))
+
+    def test_incomplete_backend_fails_on_creation(self):
+        """Test that a backend missing interface methods can't be instantiated"""
+        class GetOnlyBackend(self.cache.CacheBackend):
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnlyBackend()
+
+    def test_request_key_and_tables(self):
+        """Test that keys ignore key order and tables cover the include spec"""
+        self.assertEqual(
+            self.cache.request_key("User", {"filters": {"a": 1, "b": 2}, "limit": 5}),
+            self.cache.request_key("User", {"limit": 5, "filters": {"b": 2, "a": 1}})
+        )
+        self.assertNotEqual(
+            self.cache.request_key("User", {"limit": 5}),
+            self.cache.request_key("Post", {"limit": 5})
+        )
+        self.assertEqual(self.cache.request_tables("User", {"posts": {}}), ("posts", "users"))
+        self.assertEqual(self.cache.request_tables("User", {}), ("users",))
+
+    async def test_commit_invalidates_touched_tables(self):
+        """Test that committing writes drops the entries reading the written tables"""
+        self.cache_response("users-only", b"u", ("users",))
+        self.cache_response("with-posts", b"p", ("posts", "users"))
+
+        user = TestGeneratedCode.User(username="cached", email="cached@example.com")
+        self.session.add(user)
+        await self.session.flush()
+        self.assertIsNotNone(self.cache.get_cached("users-only"))  # not committed yet
+        self.session.add(TestGeneratedCode.Post(title="t", content="c", user_id=user.id))
+        await self.session.rollback()
+        self.assertIsNotNone(self.cache.get_cached("users-only"))
+
+        self.session.add(TestGeneratedCode.Post(title="t", content="c", user_id=1))
+        await self.session.commit()
+        self.assertIsNotNone(self.cache.get_cached("users-only"))
+        self.assertIsNone(self.cache.get_cached("with-posts"))
+
+    def test_responses_read_before_invalidation_are_not_stored(self):
+        """Test that a response racing with a write isn't cached"""
+        versions = self.cache.table_versions(("users",))
+        self.cache.invalidate_tables(["users"])
+        self.cache.store("stale", self.cache.CachedResponse(b"s", None), ("users",), versions)
+        self.assertIsNone(self.cache.get_cached("stale"))
+
+
+class TestDatabase(unittest.IsolatedAsyncioTestCase):
+    """Connection pools and replica routing of the generated database module"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Reuses the modules generated for TestGeneratedCode
+        TestGeneratedCode.setUpClass()
+        environ = {
+            "DATABASE_URL": "sqlite+aiosqlite://",
+            "POOL_SIZE": "1",
+            "MAX_OVERFLOW": "0",
+            "POOL_TIMEOUT": "0.05",
+        }
+        with mock.patch.dict(os.environ, environ):
+            from test_output import database
+        cls.database = database
+
+    async def asyncTearDown(self):
+        await self.database.engine.dispose()
+
+    async def test_pool_metrics(self):
+        """Test that checkouts, waits and timeouts are counted"""
+        engine = self.database.engine
+        self.assertTrue(self.database.TIMED_CHECKOUTS)
+        self.assertEqual(engine.pool.timeout(), 0.05)
+        before = self.database.get_pool_metrics()
+
+        async with engine.connect():
+            metrics = self.database.get_pool_metrics()
+            self.assertEqual(metrics["checked_out"], 1)
+            with self.assertRaises(TimeoutError):
+                async with engine.connect():
+                    pass
+
+        metrics = self.database.get_pool_metrics()
+        self.assertEqual(metrics["checked_out"], 0)
+        self.assertEqual(metrics["checkouts"] - before["checkouts"], 1)
+        self.assertEqual(metrics["timeouts"] - before["timeouts"], 1)
+        self.assertGreaterEqual(metrics["checkout_wait_seconds_max"], 0.05)
+        self.assertNotIn("replicas", metrics)
+
+    async def test_replica_routing(self):
+        """Test round robin and least connections routing and the primary fallback"""
+        now = [0.0]
+        replicas = [self.database.create_pooled_engine("sqlite+aiosqlite://") for _ in range(2)]
+        router = self.database.ReplicaRouter(
+            self.database.engine, replicas, retry_seconds=10, clock=lambda: now[0]
+        )
+        try:
+            self.assertEqual([router.choose() for _ in range(4)], replicas * 2)
+
+            router.routing = "least_connections"
+            async with replicas[0].connect():
+                self.assertIs(router.choose(), replicas[1])
+
+            router.mark_unhealthy(replicas[1])
+            self.assertIs(router.choose(), replicas[0])
+            router.mark_unhealthy(replicas[0])
+            self.assertIs(router.choose(), self.database.engine)
+            now[0] = 10.0
+            self.assertIs(router.choose(), replicas[0])
+        finally:
+            for replica in replicas:
+                await replica.dispose()
+
+    async def test_read_session_falls_back_to_primary(self):
+        """Test that a replica that can't be connected to is skipped"""
+        replica = self.database.create_pooled_engine("sqlite+aiosqlite:////nonexistent/replica.db")
+        router = self.database.ReplicaRouter(self.database.engine, [replica])
+        try:
+            with mock.patch.object(self.database, "replica_router", router):
+                async with self.database.read_session() as session:
+                    self.assertIs(session.bind, self.database.engine)
+                    self.assertEqual(await session.scalar(select(1)), 1)
+            self.assertFalse(router.healthy(replica))
+            self.assertIs(router.choose(), self.database.engine)
+        finally:
+            await replica.dispose()
+
+    async def test_request_instrumentation(self):
+        """Test that statements, loaded rows and slow queries count towards the current request"""
+        engine = self.database.engine
+        async with engine.begin() as conn:
+            await conn.run_sync(TestGeneratedCode.Base.metadata.create_all)
+        session = sessionmaker(bind=engine, class_=AsyncSession)()
+        session.add_all([TestGeneratedCode.User(username=f"u{i}", email=f"u{i}@example.com") for i in range(3)])
+        await session.commit()
+
+        stats = self.database.RequestStats("/user/query")
+        token = self.database.current_request_stats.set(stats)
+        try:
+            with mock.patch.object(self.database.settings, "slow_query_ms", 0), \
+                    self.assertLogs("test_output.database.slow_queries", "WARNING") as logs:
+                users = (await session.scalars(select(TestGeneratedCode.User))).all()
+        finally:
+            self.database.current_request_stats.reset(token)
+        self.assertEqual(len(users), 3)
+        self.assertEqual((stats.statements, stats.rows, stats.slow_queries), (1, 3, 1))
+        self.assertIn("FROM users", logs.output[0])
+        self.assertIn("/user/query", logs.output[0])
+        self.assertNotIn("parameters", logs.output[0])
+
+        # Bound parameters may hold user data, so they're only logged when enabled
+        try:
+            with mock.patch.object(self.database.settings, "slow_query_ms", 0), \
+                    mock.patch.object(self.database.settings, "slow_query_log_parameters", True), \
+                    self.assertLogs("test_output.database.slow_queries", "WARNING") as logs:
+                await session.scalars(select(TestGeneratedCode.User).where(TestGeneratedCode.User.username == "u1"))
+        finally:
+            await session.close()
+        self.assertIn("parameters: ('u1',", logs.output[0])
+
+        stats.include_shapes.update({"", "posts"})
+        self.assertRegex(stats.server_timing(0.01), r'^db;dur=[0-9.]+;desc="1 statements", rows;desc="3", ')
+        self.assertIn('total;dur=10.00, include;desc="- | posts"', stats.server_timing(0.01))
+
+        metrics = self.database.RequestMetrics()
+        metrics.observe(stats, 0.01)
+        metrics.observe(self.database.RequestStats("/user/query"), 0.01)
+        rendered = metrics.render()
+        self.assertIn('# TYPE sql_statements_total counter', rendered)
+        self.assertIn('requests_total{route="/user/query"} 2', rendered)
+        self.assertIn('rows_total{route="/user/query"} 3', rendered)
+
+
+class TestHandlers(unittest.IsolatedAsyncioTestCase):
+    """Generated router, driven through an ASGI client"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Reuses the modules generated for TestGeneratedCode and the
+        # database module imported for TestDatabase
+        TestDatabase.setUpClass()
+        cls.database = TestDatabase.database
+        context = {'models': TestGeneratedCode.test_models, 'options': {'streaming': True}}
+        render_template('handlers.py.jinja2', context, os.path.join(TestGeneratedCode.test_output_dir, 'handlers.py'))
+        from test_output import handlers
+        cls.handlers = handlers
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(self.tmp_dir.name, 'handlers.db')}")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(TestGeneratedCode.Base.metadata.create_all)
+        session_factory = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_factory() as session:
+            users = [TestGeneratedCode.User(username=f"user{i}", email=f"user{i}@example.com") for i in (1, 2)]
+            session.add_all(users)
+            await session.flush()
+            session.add_all([
+                TestGeneratedCode.Post(title=f"Post {i}", content=f"Content {i}", user_id=users[i // 3].id)
+                for i in range(1, 4)
+            ])
+            await session.commit()
+
+        # Sessions of the generated handlers use the test database
+        patches = [
+            mock.patch.object(self.database, "AsyncSessionLocal", session_factory),
+            mock.patch.object(self.database, "replica_router", self.database.ReplicaRouter(self.engine, [])),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        # Statements run and the peak number of connections checked out
+        self.statements = 0
+        self.checked_out = self.peak_checked_out = 0
+
+        def count_statement(*_):
+            self.statements += 1
+
+        def checkout(*_):
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+        def checkin(*_):
+            self.checked_out -= 1
+
+        event.listen(self.engine.sync_engine, "before_cursor_execute", count_statement)
+        event.listen(self.engine.sync_engine, "checkout", checkout)
+        event.listen(self.engine.sync_engine, "checkin", checkin)
+
+        app = FastAPI()
+        app.include_router(self.handlers.router)
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await self.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    async def test_query_endpoint(self):
+        """Test that pages are encoded with their cursor and empty results are a 404"""
+        response = await self.client.post("/user/query", json={"limit": 1, "include": {"posts": {}}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user["username"] for user in response.json()], ["user1"])
+        self.assertEqual([post["title"] for post in response.json()[0]["posts"]], ["Post 1", "Post 2"])
+
+        response = await self.client.post("/user/query", json={"limit": 1, "cursor": response.headers["X-Next-Cursor"]})
+        self.assertEqual([user["username"] for user in response.json()], ["user2"])
+        self.assertNotIn("X-Next-Cursor", response.headers)
+
+        response = await self.client.post("/post/query", json={"filters": {"title": "missing"}})
+        self.assertEqual(response.status_code, 404)
+        response = await self.client.post("/post/query", json={"filters": {"password": "secret"}})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_aggregate_endpoint_limit(self):
+        """Test that aggregates aren't cut to the page size and too many groups are a 400"""
+        body = {"group_by": ["user_id"], "count": True}
+        with mock.patch.object(self.database.settings, "default_page_size", 1):
+            response = await self.client.post("/post/query", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{"user_id": 1, "count": 2}, {"user_id": 2, "count": 1}])
+
+        response = await self.client.post("/post/query", json={**body, "limit": 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("more than 1 groups", response.json()["detail"])
+        with mock.patch.object(self.database.settings, "max_page_size", 1):
+            response = await self.client.post("/post/query", json=body)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_cyclic_include(self):
+        """Test that an include leading back to the root row is encoded once per level"""
+        body = {"include": {"posts": {"include": {"user": {}}}}}
+        expected_user = {"id": 1, "username": "user1", "email": "user1@example.com"}
+        response = await self.client.post("/user/query", json=body)
+        self.assertEqual(response.status_code, 200)
+        user = response.json()[0]
+        self.assertEqual([post["user"] for post in user["posts"]], [expected_user, expected_user])
+
+        response = await self.client.post("/user/query/stream", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.text.splitlines()[0]), user)
+
+        response = await self.client.post("/batch/query", json={"queries": [{"model": "User", "query": body}]})
+        self.assertEqual(response.json()[0]["data"][0], user)
+
+        # The schemas have no many_to_one fields, so validated responses stop at posts
+        with mock.patch.object(self.database.settings, "validate_responses", True):
+            response = await self.client.post("/user/query", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()[0]["posts"]), 2)
+
+    async def test_stream_endpoint(self):
+        """Test that streams return every matching row and reject paging"""
+        response = await self.client.post("/post/query/stream", json={"filters": {"user_id": 1}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([json.loads(line)["title"] for line in response.text.splitlines()], ["Post 1", "Post 2"])
+
+        for body in ({"limit": 1}, {"cursor": "WzFd"}, {"count": True}):
+            response = await self.client.post("/post/query/stream", json=body)
+            self.assertEqual(response.status_code, 400)
+
+    async def test_batch_query(self):
+        """Test that batch entries keep their order, run once and fail on their own"""
+        queries = [
+            {"model": "User", "query": {}},
+            {"model": "Comment", "query": {}},
+            {"model": "Post", "query": {"filters": {"password": "secret"}}},
+            {"model": "Post", "query": {"filters": {"title": "Post 2"}}},
+            {"model": "User", "query": {}},
+            {"model": "Post", "query": {"filters": {"title": "missing"}}},
+        ]
+        with mock.patch.object(self.database.settings, "batch_concurrency", 2):
+            response = await self.client.post("/batch/query", json={"queries": queries})
+
+        self.assertEqual(response.status_code, 200)
+        entries = response.json()
+        self.assertEqual([entry["status"] for entry in entries], [200, 400, 400, 200, 200, 404])
+        self.assertEqual([user["username"] for user in entries[0]["data"]], ["user1", "user2"])
+        self.assertEqual(entries[4], entries[0])
+        self.assertEqual([post["title"] for post in entries[3]["data"]], ["Post 2"])
+        self.assertIn("Comment", entries[1]["detail"])
+
+        # One statement per distinct valid entry, on at most two sessions
+        self.assertEqual(self.statements, 3)
+        self.assertEqual(self.peak_checked_out, 2)
+
+        with mock.patch.object(self.database.settings, "max_batch_size", 2):
+            response = await self.client.post("/batch/query", json={"queries": queries})
+        self.assertEqual(response.status_code, 400)
+
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -1,6 +1,6 @@
 import unittest
 import os
-from ..codegen import render_template
+from fastapi_code_generator.codegen import render_template
 
 class TestTemplateRendering(unittest.TestCase):
     @classmethod
@@ -71,7 +71,9 @@ class TestTemplateRendering(unittest.TestCase):
     def setUp(self):
         # Clean test output directory before each test
         for file in os.listdir(self.test_output_dir):
-            os.remove(os.path.join(self.test_output_dir, file))
+            path = os.path.join(self.test_output_dir, file)
+            if os.path.isfile(path):
+                os.remove(path)
 
     def test_models_template(self):
         """Test that models.py.jinja2 generates valid SQLAlchemy models"""
@@ -89,7 +91,44 @@ class TestTemplateRendering(unittest.TestCase):
         self.assertIn('__tablename__ = "posts"', content)
         self.assertIn('primary_key=True', content)
         self.assertIn('ForeignKey("users.id")', content)
-        
+        self.assertIn(', index=True', content)
+        self.assertIn('lazy="raise"', content)
+
+    def test_models_template_indexes(self):
+        """Test that declared indexes and foreign keys get indexes"""
+        models = {
+            "User": dict(self.test_models["User"], fields=self.test_models["User"]["fields"] + [
+                {"name": "email", "type": "String", "unique": True}
+            ]),
+            "Post": dict(self.test_models["Post"], indexes=[
+                {"columns": ["user_id", "title"]},
+                {"name": "uq_posts_title", "columns": ["title"], "unique": True},
+            ]),
+        }
+        output_file = os.path.join(self.test_output_dir, 'models.py')
+        render_template('models.py.jinja2', {'models': models}, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, Index', content)
+        self.assertIn('Index("ix_posts_user_id_title", "user_id", "title", unique=False)', content)
+        self.assertIn('Index("uq_posts_title", "title", unique=True)', content)
+        self.assertIn(', unique=True', content)
+
+        output_file = os.path.join(self.test_output_dir, 'index_migration.py')
+        context = {'models': models, 'options': {'index_migration': {'down_revision': 'base'}}}
+        render_template('index_migration.py.jinja2', context, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('down_revision = "base"', content)
+        self.assertIn('("ix_users_email", "users", ["email"], True)', content)
+        self.assertIn('("ix_posts_user_id", "posts", ["user_id"], False)', content)
+        self.assertIn('("ix_posts_user_id_title", "posts", ["user_id", "title"], False)', content)
+        self.assertNotIn('"ix_users_id"', content)
+
     def test_handlers_template(self):
         """Test that handlers.py.jinja2 generates valid FastAPI handlers"""
         output_file = os.path.join(self.test_output_dir, 'handlers.py')
@@ -109,7 +148,34 @@ class TestTemplateRendering(unittest.TestCase):
         self.assertIn('-> List[PostSchema]:', content)
         self.assertIn('response_model=List[UserSchema]', content)
         self.assertIn('response_model=List[PostSchema]', content)
+        self.assertIn('response.headers["X-Next-Cursor"] = next_cursor', content)
+        self.assertIn('content, next_cursor = await run_query(session, "User", body)', content)
+        self.assertIn('dump_rows(SERIALIZERS[model_name], results, include_tree(include_spec))', content)
+        self.assertIn('"/batch/query"', content)
+        self.assertIn('"/metrics/pool"', content)
+        self.assertIn('results = await query_aggregate(', content)
+        self.assertIn('@router.put(\n    "/user/bulk"', content)
+        self.assertIn('return await run_bulk_write(session, bulk_delete, Post, body.keys)', content)
+        self.assertIn('if len(body.queries) > settings.max_batch_size:', content)
+        self.assertIn('validate = settings.validate_responses and not aggregate and not is_projection(body.fields, include_spec)', content)
+        self.assertNotIn('get_cached(', content)
         
+    def test_handlers_template_streaming(self):
+        """Test that the streaming handlers are generated only when enabled"""
+        output_file = os.path.join(self.test_output_dir, 'handlers.py')
+        render_template('handlers.py.jinja2', self.context, output_file)
+        with open(output_file, 'r') as f:
+            self.assertNotIn('/query/stream', f.read())
+
+        context = dict(self.context, options={'streaming': True})
+        render_template('handlers.py.jinja2', context, output_file)
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('"/user/query/stream"', content)
+        self.assertIn('async def stream_post(', content)
+        self.assertIn('media_type="application/x-ndjson"', content)
+
     def test_schemas_template(self):
         """Test that schemas.py.jinja2 generates valid Pydantic models"""
         output_file = os.path.join(self.test_output_dir, 'schemas.py')
@@ -127,6 +193,8 @@ class TestTemplateRendering(unittest.TestCase):
         self.assertIn('username: str', content)  # Field definition
         self.assertIn('title: str', content)     # Field definition
         self.assertIn('UserSchema.model_rebuild()', content)  # Forward ref handling
+        self.assertIn('class UserRow(BaseModel):', content)
+        self.assertIn('    id: Optional[int] = None\n    username: str', content)
         self.assertIn('PostSchema.model_rebuild()', content)  # Forward ref handling
         
     def test_query_processor_template(self):
@@ -145,6 +213,111 @@ class TestTemplateRendering(unittest.TestCase):
         self.assertIn('"Post": Post', content)
         self.assertIn('def flatten_includes(', content)
         self.assertIn('def make_selectin_loaders(', content)
+        self.assertIn('"username": User.username', content)
+        self.assertIn('"user": RelationshipInfo(Post.user, User, "many_to_one", joinedload)', content)
+        self.assertIn('INCLUDE_PATHS: Dict[str, Dict[str, str]]', content)
+
+    def test_query_processor_loader_override(self):
+        """Test that a relationship's loader key overrides the per-kind default"""
+        models = {
+            "User": dict(self.test_models["User"], relationships=[
+                {"name": "posts", "kind": "one_to_many", "target": "Post", "back_populates": "user", "loader": "subquery"}
+            ]),
+            "Post": self.test_models["Post"],
+        }
+        output_file = os.path.join(self.test_output_dir, 'query_processor.py')
+        render_template('query_processor.py.jinja2', {'models': models}, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('"posts": RelationshipInfo(User.posts, Post, "one_to_many", subqueryload)', content)
+        self.assertIn('"user": RelationshipInfo(Post.user, User, "many_to_one", joinedload)', content)
+
+    def test_query_processor_budget(self):
+        """Test that the query budget option and relationship fanouts are generated"""
+        models = {
+            "User": dict(self.test_models["User"], relationships=[
+                {"name": "posts", "kind": "one_to_many", "target": "Post", "back_populates": "user", "fanout": 50}
+            ]),
+            "Post": self.test_models["Post"],
+        }
+        context = {'models': models, 'options': {'query_budget': {'max_include_paths': 5, 'max_loaded_rows': 1000}}}
+        output_file = os.path.join(self.test_output_dir, 'query_processor.py')
+        render_template('query_processor.py.jinja2', context, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('"posts": 50,', content)
+        self.assertIn('"user": 1,', content)
+        self.assertIn('MAX_INCLUDE_PATHS = 5', content)
+        self.assertIn('MAX_ESTIMATED_ROWS = 100000', content)
+        self.assertIn('MAX_LOADED_ROWS = 1000', content)
+
+    def test_handlers_template_response_cache(self):
+        """Test that the response cache option wraps the query handlers"""
+        output_file = os.path.join(self.test_output_dir, 'handlers.py')
+        context = dict(self.context, options={'response_cache': {'ttl': 5}})
+        render_template('handlers.py.jinja2', context, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('from .cache import CachedResponse, get_cached', content)
+        self.assertIn('cache_key = request_key(model_name, request)', content)
+        self.assertIn('store(cache_key, CachedResponse(content, next_cursor), tables, versions)', content)
+
+        output_file = os.path.join(self.test_output_dir, 'cache.py')
+        render_template('cache.py.jinja2', context, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('CACHE_TTL_SECONDS = 5', content)
+        self.assertIn('class MemoryCacheBackend(CacheBackend):', content)
+
+    def test_handlers_template_instrumentation(self):
+        """Test that the instrumentation option times requests and exposes counters"""
+        output_file = os.path.join(self.test_output_dir, 'handlers.py')
+        render_template('handlers.py.jinja2', self.context, output_file)
+
+        with open(output_file, 'r') as f:
+            self.assertNotIn('InstrumentedRoute', f.read())
+
+        context = dict(self.context, options={'instrumentation': True})
+        render_template('handlers.py.jinja2', context, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('router = APIRouter(route_class=InstrumentedRoute)', content)
+        self.assertIn('response.headers["Server-Timing"] = stats.server_timing(total)', content)
+        self.assertIn('stats.serialize_seconds += time.perf_counter() - start', content)
+        self.assertIn('"/metrics",', content)
+
+        output_file = os.path.join(self.test_output_dir, 'database.py')
+        render_template('database.py.jinja2', context, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('slow_query_ms: float = 500.0', content)
+        self.assertIn('    instrument_engine(engine)', content)
+
+    def test_serializers_template(self):
+        """Test that serializers.py.jinja2 generates a serializer per model"""
+        output_file = os.path.join(self.test_output_dir, 'serializers.py')
+        render_template('serializers.py.jinja2', self.context, output_file)
+
+        with open(output_file, 'r') as f:
+            content = f.read()
+
+        self.assertIn('def serialize_user(row: Any, include: Dict[str, Any]) -> Dict[str, Any]:', content)
+        self.assertIn('def serialize_post(row: Any, include: Dict[str, Any]) -> Dict[str, Any]:', content)
+        self.assertIn('if "user" in include and "user" in loaded:', content)
+        self.assertIn('data["user"] = serialize_user(value, include["user"]) if value is not None else None', content)
+        self.assertIn('"Post": serialize_post,', content)
 
     def test_openapi_template(self):
         """Test that openapi.yaml.jinja2 generates valid OpenAPI spec"""
@@ -159,6 +332,8 @@ class TestTemplateRendering(unittest.TestCase):
         self.assertIn('paths:', content)
         self.assertIn('/user/query:', content)
         self.assertIn('/post/query:', content)
+        self.assertIn('X-Next-Cursor:', content)
+        self.assertIn("$ref: '#/components/schemas/AggregateRow'", content)
         self.assertIn('components:', content)
         self.assertIn('schemas:', content)
 
@@ -173,6 +348,8 @@ class TestTemplateRendering(unittest.TestCase):
         # Check for essential components
         self.assertIn('from sqlalchemy.orm import sessionmaker', content)
         self.assertIn('def get_session()', content)
+        self.assertIn('pool_pre_ping=settings.pool_pre_ping', content)
+        self.assertIn('poolclass=InstrumentedQueuePool', content)
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file